@@ -7,7 +7,13 @@ import json
 
 # Import with error handling
 try:
+    import artifact_store as store
+    import audio_server
+    import audio_utils as au
     import gemini_utils as gu
+    import podcast_pipeline as pp
+    import segment_library as sl
+    import transcript_utils as tu
 except ImportError:
     print("gemini_utils module not found. Please ensure it's installed and available.")
     exit()
@@ -29,67 +35,7 @@ def validate_inputs(text_input, api_key):
     return errors
 
 
-def get_system_prompt(text_input, podcast_style="educational", target_duration="5-8 minutes", target_audience="general"):
-    """Generate system prompt for transcript creation"""
-    min_target_duration_minutes = int(target_duration.split()[0].split("-")[0])
-    max_target_duration_minutes = int(target_duration.split()[0].split("-")[1])
-    target_duration_words = min_target_duration_minutes * 100
-    return f"""
-You are an expert podcast script writer specializing in creating engaging, educational audio content. Your task is to transform the provided text into a natural, conversational podcast transcript.
-
-**PODCAST SPECIFICATIONS:**
-- Style: {podcast_style} podcast
-- Target Duration: {target_duration} (approximately {target_duration_words} words)
-- Target Audience: {target_audience} audience
-- Format: Single narrator speaking directly to listeners
-
-**SCRIPT STRUCTURE:**
-1. **Hook (30-45 seconds)**: Start with an intriguing question, surprising fact, or compelling statement that grabs attention about the topic
-2. **Introduction (30-60 seconds)**: Briefly introduce the topic and what listeners will learn
-3. **Main Content ({min_target_duration_minutes - 2}-{max_target_duration_minutes -2} minutes)**: Present the key information in 2-4 digestible segments with smooth transitions
-4. **Conclusion (30-45 seconds)**: Summarize key takeaways and end with a thought-provoking statement
-
-**WRITING STYLE REQUIREMENTS:**
-- Use conversational, natural language as if speaking to a friend
-- Include rhetorical questions to engage listeners
-- Add smooth transitions between topics ("Now that we've covered X, let's explore Y...")
-- Use analogies and examples to explain complex concepts
-- Include brief pauses indicated by natural sentence breaks
-- Vary sentence length for natural rhythm
-- Use active voice and present tense when possible
-
-**CONTENT GUIDELINES:**
-- Make complex ideas accessible without dumbing them down
-- Include specific examples or case studies when relevant
-- Add context for why this information matters to listeners
-- Build concepts progressively from simple to complex
-- Include actionable insights or takeaways
-
-**FORMATTING RULES:**
-- Write in plain text only (no markdown, HTML, or special characters)
-- Use standard punctuation for natural speech patterns
-- Do not include stage directions, speaker labels, or technical notes
-- Do not use ALL CAPS, emojis, or excessive punctuation
-- Write as a continuous script, not bullet points
-- Do not include scene directions, speaker labels, or technical notes
-- Do not include any audio/music/sound effects/background instructions.
-- Enclose all tone and voice instructions in [ and ] tags.
-
-**TONE AND VOICE:**
-- Enthusiastic but not overly excited
-- Authoritative yet approachable
-- Curious and engaging
-- Professional but conversational
-- Add Tone and voice instructions in the transcript.
-
-Transform this source material into an engaging podcast script:
-
-{text_input}
-
-Remember: This will be converted to audio, so prioritize clarity, natural flow, and listener engagement over visual formatting."""
-
-
-def generate_transcript(text_input, api_key, text_model, podcast_style, target_duration, target_audience):
+def generate_transcript(text_input, api_key, text_model, podcast_style, target_duration, target_audience, audio_model=None, quality_tier="any"):
     """Generate transcript with error handling"""
     try:
         # Validate inputs
@@ -97,19 +43,38 @@ def generate_transcript(text_input, api_key, text_model, podcast_style, target_d
         if errors:
             return "\n".join([f"❌ {error}" for error in errors]), ""
 
+        # Size the transcript for the TTS model the router would pick for "auto"
+        audio_model = gu.resolve_model("audio", audio_model, quality_tier)
+
         # Generate system prompt
-        system_prompt = get_system_prompt(
-            text_input, podcast_style, target_duration, target_audience)
+        system_prompt = tu.get_system_prompt(
+            text_input, podcast_style, target_duration, target_audience, audio_model, gu.DEFAULT_VOICE)
 
         # Get transcript from Gemini
-        response = gu.get_text_response(api_key, text_model, system_prompt)
-
-        return "✅ Transcript generated successfully!", response.strip()
+        response = gu.get_text_response(
+            api_key, text_model, system_prompt, quality_tier)
+
+        # Check the spoken length before any audio is rendered
+        fitted = tu.fit_transcript_to_duration(
+            response.strip(), target_duration,
+            lambda prompt: gu.get_text_response(
+                api_key, text_model, prompt, quality_tier),
+            audio_model, gu.DEFAULT_VOICE)
+        estimate = tu.format_duration(fitted["estimated_seconds"])
+        if fitted["adjusted"]:
+            original = tu.format_duration(fitted["original_seconds"])
+            status = f"✅ Transcript generated and resized from {original} to about {estimate} to fit {target_duration}!"
+        else:
+            status = f"✅ Transcript generated successfully! (estimated length {estimate})"
+        if fitted["warning"]:
+            status += f"\n\n⚠️ {fitted['warning']}"
+
+        return status, fitted["transcript"]
     except Exception as e:
         return f"❌ Error generating transcript: {str(e)}", ""
 
 
-def generate_audio(transcript, api_key, audio_model):
+def generate_audio(transcript, api_key, audio_model, quality_tier="any", show=""):
     """Generate podcast audio with error handling"""
     try:
         if not transcript or transcript.strip() == "":
@@ -118,22 +83,88 @@ def generate_audio(transcript, api_key, audio_model):
         if not api_key or api_key.strip() == "":
             return "❌ API key is required", None
 
-        # Generate audio from transcript
-        audio_data = gu.get_audio_response(api_key, audio_model, transcript)
+        # Strip tone tags, markdown and extra whitespace before TTS
+        prepared = tu.prepare_for_tts(
+            transcript, model=gu.resolve_model("audio", audio_model, quality_tier),
+            voice=gu.DEFAULT_VOICE)
+        if not prepared["tts_text"]:
+            return "❌ Transcript has no speakable text after normalization.", None
+
+        # Generate audio from transcript, splicing in the show's
+        # pre-rendered segments instead of synthesizing them again
+        reused_segments = []
+        if show and show.strip():
+            result = pp.synthesize_with_segments(
+                api_key, audio_model, transcript, show.strip(), quality_tier=quality_tier)
+            audio_data = result["audio"]
+            reused_segments = result["reused_segments"]
+            spoken_by = result["model"]
+        else:
+            audio_data = gu.get_audio_response(
+                api_key, audio_model, prepared["tts_text"], quality_tier=quality_tier)
+            # With "auto" the audio may come from a hedged or failover model,
+            # so it cannot be attributed to one model for calibration
+            spoken_by = None if audio_model == gu.AUTO_MODEL else audio_model
 
         if audio_data is None:
             return "❌ Failed to generate audio", None
 
-        # Save audio to temporary file
-        temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        temp_audio.write(audio_data)
-        temp_audio.close()
+        # Calibrate the speech rate used for future duration estimates
+        duration = au.get_wav_duration(audio_data)
+        if duration and spoken_by and not reused_segments:
+            tu.record_speech_rate(
+                spoken_by, gu.DEFAULT_VOICE, prepared["text"], duration)
+
+        # Store the episode so the audio server can stream it
+        episode_id = store.save_artifact(audio_data, "wav")
 
-        return "✅ Audio generated successfully!", temp_audio.name
+        length = tu.format_duration(duration or prepared["estimated_seconds"])
+        if reused_segments:
+            return f"✅ Audio generated successfully! (length {length}, reused segments: {', '.join(reused_segments)})", episode_id
+        return f"✅ Audio generated successfully! (length {length})", episode_id
     except Exception as e:
         return f"❌ Error generating audio: {str(e)}", None
 
 
+def register_show_segment(show, segment_name, segment_text):
+    """Register a reusable segment with error handling"""
+    try:
+        sl.register_segment(show, segment_name, segment_text)
+        return f"✅ Segment '{segment_name}' saved.", describe_show_segments(show)
+    except Exception as e:
+        return f"❌ Error saving segment: {str(e)}", describe_show_segments(show)
+
+
+def describe_show_segments(show):
+    """List the segments registered for a show"""
+    segments = sl.list_segments(show.strip()) if show and show.strip() else {}
+    if not segments:
+        return "No segments registered for this show."
+    return "\n".join(f"- `{{{{{name}}}}}`: {text}" for name, text in segments.items())
+
+
+def generate_express_podcast(text_input, api_key, text_model, audio_model, podcast_style, target_duration, target_audience, quality_tier="any"):
+    """Generate transcript and audio in one overlapped pass with error handling"""
+    try:
+        errors = validate_inputs(text_input, api_key)
+        if errors:
+            return "\n".join([f"❌ {error}" for error in errors]), "", None
+
+        # Resolve "auto" once so the word target suits the model that reads it
+        audio_model = gu.resolve_model("audio", audio_model, quality_tier)
+        system_prompt = tu.get_system_prompt(
+            text_input, podcast_style, target_duration, target_audience, audio_model, gu.DEFAULT_VOICE)
+
+        # Audio for each paragraph is rendered while the next one is written
+        result = pp.generate_express(
+            api_key, text_model, audio_model, system_prompt, quality_tier=quality_tier)
+
+        episode_id = store.save_artifact(result["audio"], "wav")
+        return f"✅ Transcript and audio generated in {result['timings']['total']:.0f}s!", result["transcript"], episode_id
+    except Exception as e:
+        return f"❌ Error in express generation: {str(e)}", "", None
+
+
 def create_download_package(raw_text, system_prompt, transcript, audio_file):
     """Create a zip file with all content for download"""
     try:
@@ -174,6 +205,13 @@ def create_download_package(raw_text, system_prompt, transcript, audio_file):
         return f"❌ Error creating download package: {str(e)}", None
 
 
+def render_audio_player(episode_id):
+    """Render an audio player that streams the episode from the audio endpoint"""
+    if not episode_id:
+        return "<p><em>Generated audio will appear here.</em></p>"
+    return f'<audio controls preload="metadata" style="width: 100%" src="{audio_server.episode_url(episode_id)}"></audio>'
+
+
 def update_character_count(text):
     """Update character count display"""
     if text:
@@ -198,7 +236,7 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
             with gr.Column():
                 text_model = gr.Dropdown(
                     choices=["gemma-3n-e4b-it", "gemini-2.0-flash",
-                             "gemini-2.5-flash-preview-05-20"],
+                             "gemini-2.5-flash-preview-05-20", "auto"],
                     value="gemini-2.0-flash",
                     label="Text Model",
                     info="Select the model for transcript generation"
@@ -207,12 +245,20 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
             with gr.Column():
                 audio_model = gr.Dropdown(
                     choices=["gemini-2.5-flash-preview-tts",
-                             "gemini-2.5-pro-preview-tts"],
+                             "gemini-2.5-pro-preview-tts", "auto"],
                     value="gemini-2.5-flash-preview-tts",
                     label="Audio Model",
                     info="Select the model for audio generation"
                 )
 
+            with gr.Column():
+                quality_tier = gr.Dropdown(
+                    choices=["any", "standard", "high"],
+                    value="any",
+                    label="Quality Tier",
+                    info="Minimum model quality when a model is set to auto, which picks the fastest healthy model"
+                )
+
         # API Key
         api_key = gr.Textbox(
             label="🔑 Gemini API Key",
@@ -253,6 +299,23 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
                 info="Primary audience for this podcast"
             )
 
+    # Segment Library
+    with gr.Accordion("🧩 Segment Library", open=False):
+        gr.Markdown(
+            "Register fixed snippets such as the intro or sign-off. They are rendered once per voice and model and reused in every episode of the show, either where their text appears in the transcript or where a `{{name}}` marker is placed.")
+        show_name = gr.Textbox(
+            label="Show",
+            placeholder="Leave empty to synthesize the whole transcript",
+            info="Episodes of this show reuse its pre-rendered segments"
+        )
+        with gr.Row():
+            segment_name = gr.Textbox(label="Segment Name", placeholder="intro")
+            segment_text = gr.Textbox(
+                label="Segment Text", placeholder="Welcome to the show...", scale=3)
+        register_segment_btn = gr.Button("💾 Save Segment", variant="secondary")
+        segment_status = gr.Markdown("")
+        segment_list = gr.Markdown("No segments registered for this show.")
+
     # Input Text Section
     with gr.Row():
         gr.Markdown("## 📄 Input Text")
@@ -278,6 +341,8 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
     with gr.Row():
         generate_transcript_btn = gr.Button(
             "🔄 Generate Transcript", variant="primary", size="lg")
+        express_btn = gr.Button(
+            "⚡ Express: Transcript + Audio", variant="secondary", size="lg")
 
     transcript_status = gr.Markdown("")
 
@@ -306,15 +371,17 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
 
     audio_status = gr.Markdown("")
 
+    # Store the episode ID for the download package
+    episode_id_state = gr.State("")
+
     # Audio Player
     with gr.Row():
         gr.Markdown("## 🔊 Audio Player")
 
-    audio_player = gr.Audio(
-        label="Generated Podcast Audio",
-        type="filepath",
-        interactive=False
-    )
+    # A plain <audio> element pointed at the episode endpoint on this app's
+    # origin, so the browser streams and seeks with Range requests instead of
+    # Gradio copying the whole file into its cache first
+    audio_player = gr.HTML(render_audio_player(""))
 
     # Download Section
     with gr.Row():
@@ -328,18 +395,29 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
     download_file = gr.File(label="Download Package", visible=False)
 
     # Event handlers
-    def handle_transcript_generation(raw_text, api_key, text_model, podcast_style, target_duration, target_audience):
+    def handle_transcript_generation(raw_text, api_key, text_model, podcast_style, target_duration, target_audience, audio_model, quality_tier):
+        audio_model = gu.resolve_model("audio", audio_model, quality_tier)
         status, transcript = generate_transcript(
-            raw_text, api_key, text_model, podcast_style, target_duration, target_audience)
-        system_prompt = get_system_prompt(
-            raw_text, podcast_style, target_duration, target_audience) if transcript else ""
+            raw_text, api_key, text_model, podcast_style, target_duration, target_audience, audio_model, quality_tier)
+        system_prompt = tu.get_system_prompt(
+            raw_text, podcast_style, target_duration, target_audience, audio_model, gu.DEFAULT_VOICE) if transcript else ""
         return status, transcript, system_prompt
 
-    def handle_audio_generation(transcript, api_key, audio_model):
-        status, audio_path = generate_audio(transcript, api_key, audio_model)
-        return status, audio_path
-
-    def handle_download_creation(raw_text, system_prompt, transcript, audio_file):
+    def handle_audio_generation(transcript, api_key, audio_model, quality_tier, show):
+        status, episode_id = generate_audio(
+            transcript, api_key, audio_model, quality_tier, show)
+        return status, render_audio_player(episode_id), episode_id or ""
+
+    def handle_express_generation(raw_text, api_key, text_model, audio_model, podcast_style, target_duration, target_audience, quality_tier):
+        audio_model = gu.resolve_model("audio", audio_model, quality_tier)
+        status, transcript, episode_id = generate_express_podcast(
+            raw_text, api_key, text_model, audio_model, podcast_style, target_duration, target_audience, quality_tier)
+        system_prompt = tu.get_system_prompt(
+            raw_text, podcast_style, target_duration, target_audience, audio_model, gu.DEFAULT_VOICE) if transcript else ""
+        return status, transcript, system_prompt, status, render_audio_player(episode_id), episode_id or ""
+
+    def handle_download_creation(raw_text, system_prompt, transcript, episode_id):
+        audio_file = str(store.artifact_path(episode_id)) if episode_id else None
         status, zip_path = create_download_package(
             raw_text, system_prompt, transcript, audio_file)
         if zip_path:
@@ -350,28 +428,46 @@ with gr.Blocks(title="🎙️ Podcast Generator", theme=gr.themes.Base()) as dem
     generate_transcript_btn.click(
         fn=handle_transcript_generation,
         inputs=[raw_text, api_key, text_model,
-                podcast_style, target_duration, target_audience],
+                podcast_style, target_duration, target_audience, audio_model, quality_tier],
         outputs=[transcript_status, transcript_editor, system_prompt_state]
     )
 
+    express_btn.click(
+        fn=handle_express_generation,
+        inputs=[raw_text, api_key, text_model, audio_model,
+                podcast_style, target_duration, target_audience, quality_tier],
+        outputs=[transcript_status, transcript_editor, system_prompt_state,
+                 audio_status, audio_player, episode_id_state]
+    )
+
     generate_audio_btn.click(
         fn=handle_audio_generation,
-        inputs=[transcript_editor, api_key, audio_model],
-        outputs=[audio_status, audio_player]
+        inputs=[transcript_editor, api_key, audio_model, quality_tier, show_name],
+        outputs=[audio_status, audio_player, episode_id_state]
+    )
+
+    register_segment_btn.click(
+        fn=register_show_segment,
+        inputs=[show_name, segment_name, segment_text],
+        outputs=[segment_status, segment_list]
     )
 
+    show_name.change(fn=describe_show_segments,
+                     inputs=show_name, outputs=segment_list)
+
     download_btn.click(
         fn=handle_download_creation,
         inputs=[raw_text, system_prompt_state,
-                transcript_editor, audio_player],
+                transcript_editor, episode_id_state],
         outputs=[download_status, download_file]
     )
 
+# Serve the app and the episode endpoint from the same origin, so the
+# player works wherever the app itself is reachable
+app = gr.mount_gradio_app(audio_server.app, demo, path="/", show_api=False)
+
 # Launch the app
 if __name__ == "__main__":
-    demo.launch(
-        share=False,
-        server_name="0.0.0.0",
-        server_port=7860,
-        show_api=False
-    )
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=7860)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Content-addressed store for generated artifacts such as episode audio.
+# Files are named after the SHA-256 of their content, so identical outputs are
+# stored once and an artifact ID never refers to different bytes.
+ARTIFACT_DIR = Path(os.environ.get(
+    "PODCAST_ARTIFACT_DIR",
+    Path(tempfile.gettempdir()) / "podcast-creator" / "artifacts",
+))
+
+# Eviction limits. Every file under ARTIFACT_DIR counts, including derived
+# files such as transcodes; the least recently used ones go first.
+ARTIFACT_MAX_AGE_SECONDS = float(os.environ.get(
+    "PODCAST_ARTIFACT_MAX_AGE", 7 * 24 * 3600))
+ARTIFACT_MAX_BYTES = int(os.environ.get(
+    "PODCAST_ARTIFACT_MAX_BYTES", 2 * 1024 ** 3))
+# Minimum time between automatic cleanups triggered by save_artifact
+CLEANUP_INTERVAL_SECONDS = 600
+
+_ARTIFACT_ID_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def save_artifact(data: bytes, extension: str) -> str:
+    """Stores data in the artifact store.
+
+    Args:
+        data: The artifact content.
+        extension: File extension without the dot, e.g. "wav".
+
+    Returns:
+        The artifact ID, "<sha256>.<extension>".
+    """
+    artifact_id = f"{hashlib.sha256(data).hexdigest()}.{extension.lower()}"
+    path = artifact_path(artifact_id)
+    if path.exists():
+        touch(path)
+    else:
+        ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see partial content
+        fd, temp_path = tempfile.mkstemp(dir=ARTIFACT_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        _maybe_cleanup()
+    return artifact_id
+
+
+def artifact_path(artifact_id: str) -> Path:
+    """Returns the on-disk path for an artifact ID.
+
+    Raises:
+        ValueError: If the ID is not a valid artifact ID.
+    """
+    if not _ARTIFACT_ID_RE.match(artifact_id or ""):
+        raise ValueError(f"Invalid artifact ID: {artifact_id!r}")
+    return ARTIFACT_DIR / artifact_id
+
+
+def load_artifact(artifact_id: str) -> bytes:
+    """Reads an artifact's content.
+
+    Raises:
+        ValueError: If the ID is not a valid artifact ID.
+        FileNotFoundError: If the artifact is not in the store.
+    """
+    path = artifact_path(artifact_id)
+    data = path.read_bytes()
+    touch(path)
+    return data
+
+
+def save_text(text: str) -> str:
+    """Stores text as a UTF-8 artifact and returns its ID."""
+    return save_artifact(text.encode("utf-8"), "txt")
+
+
+def load_text(artifact_id: str) -> str:
+    """Reads a text artifact stored with save_text."""
+    return load_artifact(artifact_id).decode("utf-8")
+
+
+def touch(path: Path) -> None:
+    """Marks a stored file as recently used so cleanup keeps it longer."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def cleanup(max_age_seconds: float = None, max_bytes: int = None) -> int:
+    """Evicts stored files that are too old or over the size budget.
+
+    Files unused for longer than max_age_seconds are removed first; if the
+    store is still larger than max_bytes, the least recently used files are
+    removed until it fits.
+
+    Args:
+        max_age_seconds: Maximum age since last use. Defaults to
+            ARTIFACT_MAX_AGE_SECONDS.
+        max_bytes: Maximum total size of the store. Defaults to
+            ARTIFACT_MAX_BYTES.
+
+    Returns:
+        The number of files removed.
+    """
+    if max_age_seconds is None:
+        max_age_seconds = ARTIFACT_MAX_AGE_SECONDS
+    if max_bytes is None:
+        max_bytes = ARTIFACT_MAX_BYTES
+
+    cutoff = time.time() - max_age_seconds
+    files = []
+    for path in ARTIFACT_DIR.rglob("*"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if not path.is_file():
+            continue
+        # Recent temporary files may still be being written
+        if path.suffix == ".tmp" and stat.st_mtime >= cutoff:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+
+    total_bytes = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if mtime >= cutoff and total_bytes <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total_bytes -= size
+        removed += 1
+    return removed
+
+
+def _maybe_cleanup():
+    global _last_cleanup
+    with _cleanup_lock:
+        now = time.monotonic()
+        if _last_cleanup and now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+            return
+        _last_cleanup = now
+    cleanup()
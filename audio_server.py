@@ -0,0 +1,136 @@
+import os
+import tempfile
+import threading
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+import artifact_store as store
+
+# Optional dependency: on-the-fly transcoding needs pydub (and ffmpeg)
+try:
+    from pydub import AudioSegment
+except ImportError:
+    AudioSegment = None
+
+AUDIO_SERVER_HOST = os.environ.get("AUDIO_SERVER_HOST", "0.0.0.0")
+AUDIO_SERVER_PORT = int(os.environ.get("AUDIO_SERVER_PORT", "8765"))
+# Base URL the browser uses to reach a standalone audio server. When unset,
+# episode URLs are relative and the endpoint must be served on the app's own
+# origin, as the Gradio app does by mounting this FastAPI app.
+AUDIO_SERVER_URL = os.environ.get("AUDIO_SERVER_URL", "").rstrip("/")
+
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+    "flac": "audio/flac",
+}
+
+# Artifacts are content-addressed, so a given URL never changes content
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+TRANSCODE_DIR = store.ARTIFACT_DIR / "transcoded"
+
+app = FastAPI(title="Podcast Audio Server")
+
+_server_lock = threading.Lock()
+_server_thread = None
+
+
+def _transcode(source_path, target_format):
+    """Converts an episode to another format, caching the result on disk."""
+    target_path = TRANSCODE_DIR / f"{source_path.stem}.{target_format}"
+    if target_path.exists():
+        store.touch(target_path)
+        return target_path
+
+    if AudioSegment is None:
+        raise HTTPException(
+            status_code=501, detail="Transcoding requires pydub to be installed")
+
+    TRANSCODE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=TRANSCODE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        AudioSegment.from_file(source_path).export(
+            temp_path, format=target_format)
+        os.replace(temp_path, target_path)
+    except Exception as e:
+        os.remove(temp_path)
+        raise HTTPException(
+            status_code=500, detail=f"Transcoding to {target_format} failed: {e}")
+    return target_path
+
+
+@app.api_route("/episodes/{artifact_id}", methods=["GET", "HEAD"])
+def serve_episode(artifact_id: str, request: Request, format: str | None = None):
+    """Serves a stored episode with Range, ETag and caching support."""
+    try:
+        path = store.artifact_path(artifact_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Episode not found")
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Episode not found")
+    store.touch(path)
+
+    etag = f'"{artifact_id}"'
+    source_format = path.suffix.lstrip(".")
+    if format and format != source_format:
+        if format not in MEDIA_TYPES:
+            raise HTTPException(
+                status_code=400, detail=f"Unsupported format: {format}")
+        etag = f'"{artifact_id}-{format}"'
+
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    if format and format != source_format:
+        path = _transcode(path, format)
+
+    # FileResponse streams the file from disk and answers Range requests
+    # with 206 Partial Content, so seeking works before the download ends.
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES.get(path.suffix.lstrip("."), "application/octet-stream"),
+        headers=headers,
+    )
+
+
+def episode_url(artifact_id: str, format: str | None = None) -> str:
+    """Returns the URL the browser should use to play an episode.
+
+    Without AUDIO_SERVER_URL the URL is relative to the current page, which
+    also keeps it working when the app is served under a path prefix.
+    """
+    if AUDIO_SERVER_URL:
+        url = f"{AUDIO_SERVER_URL}/episodes/{artifact_id}"
+    else:
+        url = f"episodes/{artifact_id}"
+    if format:
+        url += f"?format={format}"
+    return url
+
+
+def ensure_running():
+    """Starts a standalone audio server on a background thread.
+
+    Only needed by apps that cannot mount this FastAPI app on their own
+    origin; the server must then be reachable at AUDIO_SERVER_URL.
+    """
+    global _server_thread
+    with _server_lock:
+        if _server_thread is not None and _server_thread.is_alive():
+            return
+        config = uvicorn.Config(
+            app, host=AUDIO_SERVER_HOST, port=AUDIO_SERVER_PORT, log_level="warning")
+        _server_thread = threading.Thread(
+            target=uvicorn.Server(config).run, daemon=True)
+        _server_thread.start()
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=AUDIO_SERVER_HOST, port=AUDIO_SERVER_PORT)
@@ -1,4 +1,6 @@
+import io
 import struct
+import wave
 
 
 def convert_to_wav(audio_data: bytes, mime_type: str) -> bytes:
@@ -75,3 +77,113 @@ def parse_audio_mime_type(mime_type: str) -> dict[str, int | None]:
                 pass  # Keep bits_per_sample as default if conversion fails
 
     return {"bits_per_sample": bits_per_sample, "rate": rate}
+
+
+def get_wav_duration(wav_data: bytes) -> float | None:
+    """Returns the duration of WAV audio in seconds.
+
+    Args:
+        wav_data: A complete WAV file as a bytes object.
+
+    Returns:
+        The duration in seconds, or None if the data is not a readable WAV file.
+    """
+    try:
+        with wave.open(io.BytesIO(wav_data), "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def read_wav(wav_data: bytes) -> tuple[bytes, dict[str, int]]:
+    """Splits a WAV file into its raw PCM frames and format parameters.
+
+    Args:
+        wav_data: A complete WAV file as a bytes object.
+
+    Returns:
+        A tuple of the PCM frames and a dictionary with "channels",
+        "sample_width" (in bytes) and "rate" keys.
+    """
+    with wave.open(io.BytesIO(wav_data), "rb") as wav_file:
+        parameters = {
+            "channels": wav_file.getnchannels(),
+            "sample_width": wav_file.getsampwidth(),
+            "rate": wav_file.getframerate(),
+        }
+        return wav_file.readframes(wav_file.getnframes()), parameters
+
+
+def write_wav(pcm_data: bytes, parameters: dict[str, int]) -> bytes:
+    """Wraps raw PCM frames in a WAV container.
+
+    Args:
+        pcm_data: The raw PCM frames.
+        parameters: Format parameters as returned by read_wav.
+
+    Returns:
+        A complete WAV file as a bytes object.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(parameters["channels"])
+        wav_file.setsampwidth(parameters["sample_width"])
+        wav_file.setframerate(parameters["rate"])
+        wav_file.writeframes(pcm_data)
+    return buffer.getvalue()
+
+
+def make_silence(seconds: float, parameters: dict[str, int]) -> bytes:
+    """Returns PCM frames of silence in the given format."""
+    frame_count = int(seconds * parameters["rate"])
+    # 8-bit PCM is unsigned, so its silence level is the midpoint
+    silent_sample = b"\x80" if parameters["sample_width"] == 1 else b"\x00" * parameters["sample_width"]
+    return silent_sample * parameters["channels"] * frame_count
+
+
+def concatenate_pcm(pcm_parts: list[tuple[bytes, dict[str, int]]], gap_seconds: float = 0.0) -> bytes:
+    """Joins raw PCM parts that share one format into a single WAV file.
+
+    Args:
+        pcm_parts: (frames, parameters) tuples, as returned by read_wav, in
+            playback order.
+        gap_seconds: Silence to insert between consecutive parts.
+
+    Returns:
+        A single WAV file as a bytes object.
+
+    Raises:
+        ValueError: If the parts are empty or do not share the same format.
+    """
+    if not pcm_parts:
+        raise ValueError("No audio to concatenate")
+
+    pcm_data = bytearray()
+    parameters = None
+    for index, (frames, part_parameters) in enumerate(pcm_parts):
+        if parameters is None:
+            parameters = part_parameters
+        elif part_parameters != parameters:
+            raise ValueError(
+                f"Audio part {index} has format {part_parameters}, expected {parameters}")
+        elif gap_seconds:
+            pcm_data.extend(make_silence(gap_seconds, parameters))
+        pcm_data.extend(frames)
+
+    return write_wav(bytes(pcm_data), parameters)
+
+
+def concatenate_wav(wav_parts: list[bytes], gap_seconds: float = 0.0) -> bytes:
+    """Joins WAV files that share one format into a single WAV file.
+
+    Args:
+        wav_parts: The WAV files to join, in playback order.
+        gap_seconds: Silence to insert between consecutive parts.
+
+    Returns:
+        A single WAV file as a bytes object.
+
+    Raises:
+        ValueError: If the parts are empty or do not share the same format.
+    """
+    return concatenate_pcm([read_wav(part) for part in wav_parts], gap_seconds)
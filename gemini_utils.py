@@ -1,6 +1,16 @@
 import os
+import hashlib
+import json
+import statistics
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+import httpx
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 import mimetypes
 import audio_utils as au
 from dotenv import load_dotenv
@@ -8,8 +18,359 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+DEFAULT_VOICE = "Charon"
 
-def get_text_response(API_KEY=None, model=None, contents=None):
+# Selecting this model lets the router pick one from the tables below
+AUTO_MODEL = "auto"
+
+# Quality tier of each model; "auto" only considers models at or above the
+# tier requested by the caller.
+TEXT_MODELS = {
+    "gemma-3n-e4b-it": 1,
+    "gemini-2.0-flash": 2,
+    "gemini-2.5-flash-preview-05-20": 3,
+}
+AUDIO_MODELS = {
+    "gemini-2.5-flash-preview-tts": 1,
+    "gemini-2.5-pro-preview-tts": 2,
+}
+QUALITY_TIERS = {"any": 1, "standard": 2, "high": 3}
+
+# An "auto" call that has not finished well past the time its model usually
+# needs for an input of that size is hedged by starting the same request on
+# the next-best model. The fixed deadlines are used for models without stats.
+HEDGE_MARGIN = 2.0
+HEDGE_MIN_SECONDS = 20
+HEDGE_DEADLINES = {"text": 45, "audio": 120}
+
+MODEL_STATS_PATH = Path(os.environ.get(
+    "PODCAST_MODEL_STATS",
+    Path.home() / ".cache" / "podcast-creator" / "model_stats.json",
+))
+
+# Requests currently in progress, keyed by _request_key. Concurrent callers
+# with the same API key and request share one upstream generation instead of each paying for
+# their own. Entries are removed as soon as the request completes, so this is
+# deduplication only, not a cache.
+_inflight_lock = threading.Lock()
+_inflight_calls = {}
+_inflight_streams = {}
+
+
+class _InflightCall:
+    """Result slot shared by all callers waiting on the same text request."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SharedStream:
+    """Chunk buffer that any number of readers can replay and follow live."""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def append(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.finished = True
+            self.error = error
+            self.condition.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.chunks) and not self.finished:
+                    self.condition.wait()
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield chunk
+
+
+class ModelRouter:
+    """Picks models from rolling latency, error-rate and time-to-first-byte stats.
+
+    The last samples of every model are kept in memory and persisted to a
+    JSON file so that routing decisions survive restarts.
+    """
+
+    WINDOW = 50
+    # Errors older than this no longer count against a model's health
+    HEALTH_WINDOW_SECONDS = 15 * 60
+    UNHEALTHY_ERROR_RATE = 0.5
+    MIN_HEALTH_SAMPLES = 3
+
+    def __init__(self, stats_path=MODEL_STATS_PATH):
+        self.stats_path = Path(stats_path)
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self.stats_path.read_text())
+        except (OSError, ValueError):
+            return
+        for model, samples in data.items():
+            self._samples[model] = deque(samples, maxlen=self.WINDOW)
+
+    def _save(self):
+        # Stats are best effort; a read-only disk must not break generation
+        try:
+            self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(
+                dir=self.stats_path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({model: list(samples)
+                          for model, samples in self._samples.items()}, f)
+            os.replace(temp_path, self.stats_path)
+        except OSError:
+            pass
+
+    def record(self, model, seconds, first_byte_seconds, input_chars, ok):
+        """Records the outcome of one request to a model."""
+        sample = {
+            "at": time.time(),
+            "seconds": round(seconds, 3),
+            "ttfb": None if first_byte_seconds is None else round(first_byte_seconds, 3),
+            "chars": input_chars,
+            "ok": ok,
+        }
+        with self._lock:
+            self._load()
+            self._samples.setdefault(
+                model, deque(maxlen=self.WINDOW)).append(sample)
+            self._save()
+
+    def stats(self, model):
+        """Returns rolling stats for a model.
+
+        Returns:
+            A dictionary with "samples", "error_rate" (over the recent health
+            window), "seconds_per_1k_chars" and "ttfb" (medians over successful
+            requests, None without data).
+        """
+        with self._lock:
+            self._load()
+            samples = list(self._samples.get(model, ()))
+
+        recent = [sample for sample in samples
+                  if sample["at"] >= time.time() - self.HEALTH_WINDOW_SECONDS]
+        successful = [sample for sample in samples if sample["ok"]]
+        first_bytes = [sample["ttfb"]
+                       for sample in successful if sample["ttfb"] is not None]
+        return {
+            "samples": len(samples),
+            "recent_samples": len(recent),
+            "error_rate": sum(not sample["ok"] for sample in recent) / len(recent) if recent else 0.0,
+            "seconds_per_1k_chars": statistics.median(
+                sample["seconds"] * 1000 / max(sample["chars"], 1) for sample in successful) if successful else None,
+            "ttfb": statistics.median(first_bytes) if first_bytes else None,
+        }
+
+    def rank(self, models, quality_tier="any"):
+        """Orders the models that meet a quality tier from best to worst.
+
+        Models that have never been tried come first so that every model
+        gets stats, then healthy models from fastest to slowest. Models with
+        a high recent error rate, or that have never succeeded, come last.
+
+        Args:
+            models: Mapping of model name to quality tier, e.g. TEXT_MODELS.
+            quality_tier: One of QUALITY_TIERS.
+
+        Returns:
+            A non-empty list of model names.
+        """
+        # Ask for no more than the best tier available for this kind of model
+        min_tier = min(QUALITY_TIERS.get(quality_tier, 1), max(models.values()))
+
+        def sort_key(model):
+            stats = self.stats(model)
+            untried = stats["samples"] == 0
+            speed = stats["seconds_per_1k_chars"]
+            # A model with samples but no successes has only ever failed
+            unhealthy = (not untried and speed is None) or (
+                stats["recent_samples"] >= self.MIN_HEALTH_SAMPLES
+                and stats["error_rate"] >= self.UNHEALTHY_ERROR_RATE)
+            return (unhealthy, stats["error_rate"] if unhealthy else 0.0,
+                    not untried, speed or 0.0, stats["ttfb"] or 0.0)
+
+        return sorted((model for model, tier in models.items() if tier >= min_tier), key=sort_key)
+
+
+router = ModelRouter()
+
+
+def resolve_model(kind, model, quality_tier="any"):
+    """Returns the model the router currently prefers if model is "auto".
+
+    Args:
+        kind: "text" or "audio".
+        model: A model name or AUTO_MODEL.
+        quality_tier: Minimum quality tier, one of QUALITY_TIERS.
+
+    Returns:
+        model itself, or the best ranked model of that kind for "auto".
+    """
+    if model != AUTO_MODEL:
+        return model
+    return router.rank(TEXT_MODELS if kind == "text" else AUDIO_MODELS, quality_tier)[0]
+
+
+def _is_model_failure(error):
+    """Tells whether an error reflects on the health of the model.
+
+    Only server errors (5xx) and timeouts count. Client errors such as an
+    invalid API key or a rejected request would fail the same way on every
+    model, so they are neither recorded in the stats nor failed over.
+    """
+    if isinstance(error, errors.APIError):
+        return error.code is not None and error.code >= 500
+    return isinstance(error, (TimeoutError, httpx.TimeoutException))
+
+
+def _hedge_deadline(kind, model, input_chars):
+    """Returns how long to wait for a model before hedging its request."""
+    seconds_per_1k_chars = router.stats(model)["seconds_per_1k_chars"]
+    if seconds_per_1k_chars is None:
+        return HEDGE_DEADLINES[kind]
+    expected = seconds_per_1k_chars * input_chars / 1000
+    return max(HEDGE_MIN_SECONDS, expected * HEDGE_MARGIN)
+
+
+def _call_with_failover(kind, quality_tier, input_chars, call):
+    """Runs call(model) on the best model, hedging and failing over as needed.
+
+    If the call takes much longer than the model usually needs for
+    input_chars characters, the same request is started on the next-best
+    model and whichever finishes first wins. If a call fails with a server
+    error or timeout, the next model is tried straight away; any other error
+    is raised immediately.
+    """
+    models = TEXT_MODELS if kind == "text" else AUDIO_MODELS
+    remaining = router.rank(models, quality_tier)
+    executor = ThreadPoolExecutor(max_workers=len(remaining))
+
+    def start_next():
+        model = remaining.pop(0)
+        pending.add(executor.submit(call, model))
+        return _hedge_deadline(kind, model, input_chars)
+
+    pending = set()
+    deadline = start_next()
+    last_error = None
+    try:
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=deadline if remaining else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not _is_model_failure(e):
+                        raise
+                    last_error = e
+                    continue
+                if result is not None:
+                    return result
+            # Either the deadline passed or every finished call failed
+            if remaining:
+                deadline = start_next()
+    finally:
+        # Do not wait for the losing hedged calls; they finish in the
+        # background and still contribute their latency to the stats
+        executor.shutdown(wait=False)
+
+    if last_error is not None:
+        raise last_error
+    return None
+
+
+def _timed(model, input_chars, fn):
+    start = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as e:
+        if _is_model_failure(e):
+            router.record(model, time.perf_counter() - start,
+                          None, input_chars, False)
+        raise
+    elapsed = time.perf_counter() - start
+    router.record(model, elapsed, elapsed, input_chars, True)
+    return result
+
+
+def _request_key(API_KEY, *parts):
+    # Only callers using the same API key may share a request, so nobody gets
+    # results billed to another key or inherits another key's auth errors.
+    # The key is hashed together with the other parts and never stored.
+    digest = hashlib.sha256()
+    for part in (API_KEY or os.environ.get("GEMINI_API_KEY") or "", *parts):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _single_flight(key, fn):
+    """Runs fn once for all concurrent callers that use the same key."""
+    with _inflight_lock:
+        call = _inflight_calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InflightCall()
+            _inflight_calls[key] = call
+
+    if not is_leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight_calls.pop(key, None)
+        call.done.set()
+    return call.result
+
+
+def get_text_response(API_KEY=None, model=None, contents=None, quality_tier="any"):
+    if model == AUTO_MODEL:
+        return _call_with_failover(
+            "text", quality_tier, len(contents), lambda routed_model: get_text_response(API_KEY, routed_model, contents))
+
+    key = _request_key(API_KEY, "text", model, contents)
+    return _single_flight(
+        key, lambda: _timed(model, len(contents), lambda: _generate_text(API_KEY, model, contents)))
+
+
+def _generate_text(API_KEY=None, model=None, contents=None):
     client = genai.Client(
         api_key=API_KEY or os.environ.get("GEMINI_API_KEY"),
     )
@@ -35,7 +396,119 @@ def get_text_response(API_KEY=None, model=None, contents=None):
     return response.text.strip()
 
 
-def get_audio_response(API_KEY=None, model=None, contents=None):
+def get_audio_response(API_KEY=None, model=None, contents=None, voice=DEFAULT_VOICE, quality_tier="any"):
+    if model == AUTO_MODEL:
+        return _call_with_failover(
+            "audio", quality_tier, len(contents), lambda routed_model: get_audio_response(API_KEY, routed_model, contents, voice))
+
+    pcm_data = bytearray()
+    pcm_mime_type = None
+    audio_data = None
+
+    for data, mime_type in stream_audio_response(API_KEY, model, contents, voice):
+        if mimetypes.guess_extension(mime_type) is None:
+            # Raw PCM arrives in pieces; wrap it in a single WAV header at the end
+            pcm_data.extend(data)
+            pcm_mime_type = mime_type
+        else:
+            audio_data = data
+
+    if pcm_data:
+        audio_data = au.convert_to_wav(bytes(pcm_data), pcm_mime_type)
+
+    return audio_data
+
+
+def stream_audio_response(API_KEY=None, model=None, contents=None, voice=DEFAULT_VOICE, quality_tier="any"):
+    """Yields (data, mime_type) audio chunks as they are generated.
+
+    Concurrent calls with the same API key, model, transcript and voice share
+    a single upstream request: late arrivals first replay the chunks produced
+    so far and then follow the stream live. With the "auto" model, the router's best
+    model is used without hedging, since chunks may already have been consumed.
+    """
+    model = resolve_model("audio", model, quality_tier)
+    key = _request_key(API_KEY, "audio", model, voice, contents)
+    yield from _shared_stream(
+        key, model, len(contents), lambda: _generate_audio_chunks(API_KEY, model, contents, voice))
+
+
+def stream_text_response(API_KEY=None, model=None, contents=None, quality_tier="any"):
+    """Yields the text response in pieces as the model writes it.
+
+    Concurrent calls with the same API key, model and prompt share a single
+    upstream request, like stream_audio_response.
+    """
+    model = resolve_model("text", model, quality_tier)
+    key = _request_key(API_KEY, "text-stream", model, contents)
+    yield from _shared_stream(
+        key, model, len(contents), lambda: _generate_text_chunks(API_KEY, model, contents))
+
+
+def _shared_stream(key, model, input_chars, generate):
+    with _inflight_lock:
+        stream = _inflight_streams.get(key)
+        if stream is None:
+            stream = _SharedStream()
+            _inflight_streams[key] = stream
+            # The upstream request runs on its own thread so that it completes
+            # for the other readers even if the first caller stops reading.
+            threading.Thread(
+                target=_produce_stream,
+                args=(key, stream, model, input_chars, generate),
+                daemon=True,
+            ).start()
+
+    yield from stream
+
+
+def _produce_stream(key, stream, model, input_chars, generate):
+    error = None
+    start = time.perf_counter()
+    first_byte_seconds = None
+    try:
+        for chunk in generate():
+            if first_byte_seconds is None:
+                first_byte_seconds = time.perf_counter() - start
+            stream.append(chunk)
+    except Exception as e:
+        error = e
+    finally:
+        if error is None or _is_model_failure(error):
+            router.record(model, time.perf_counter() - start,
+                          first_byte_seconds, input_chars, error is None)
+        with _inflight_lock:
+            _inflight_streams.pop(key, None)
+        stream.finish(error)
+
+
+def _generate_text_chunks(API_KEY=None, model=None, contents=None):
+    client = genai.Client(
+        api_key=API_KEY or os.environ.get("GEMINI_API_KEY"),
+    )
+
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=contents),
+            ],
+        ),
+    ]
+    generate_content_config = types.GenerateContentConfig(
+        response_mime_type="text/plain",
+    )
+
+    for chunk in client.models.generate_content_stream(
+        model=model,
+        contents=contents,
+        config=generate_content_config,
+    ):
+        if chunk.text:
+            yield chunk.text
+
+
+def _generate_audio_chunks(API_KEY=None, model=None, contents=None, voice=DEFAULT_VOICE):
     client = genai.Client(
         api_key=API_KEY or os.environ.get("GEMINI_API_KEY"),
     )
@@ -56,14 +529,12 @@ def get_audio_response(API_KEY=None, model=None, contents=None):
         speech_config=types.SpeechConfig(
             voice_config=types.VoiceConfig(
                 prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                    voice_name="Charon"
+                    voice_name=voice
                 )
             )
         ),
     )
 
-    audio_data = None
-
     for chunk in client.models.generate_content_stream(
         model=model,
         contents=contents,
@@ -77,19 +548,10 @@ def get_audio_response(API_KEY=None, model=None, contents=None):
             continue
         if chunk.candidates[0].content.parts[0].inline_data and chunk.candidates[0].content.parts[0].inline_data.data:
             inline_data = chunk.candidates[0].content.parts[0].inline_data
-            data_buffer = inline_data.data
-            file_extension = mimetypes.guess_extension(inline_data.mime_type)
-            if file_extension is None:
-                file_extension = ".wav"
-                data_buffer = au.convert_to_wav(
-                    inline_data.data, inline_data.mime_type)
-
-            audio_data = data_buffer
+            yield inline_data.data, inline_data.mime_type
         else:
             print(chunk.text)
 
-    return audio_data
-
 
 if __name__ == "__main__":
     model = "gemma-3n-e4b-it"
@@ -0,0 +1,228 @@
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import audio_utils as au
+import gemini_utils as gu
+import segment_library as sl
+import transcript_utils as tu
+
+# Parallel TTS requests in express mode
+EXPRESS_TTS_WORKERS = 4
+
+# Silence inserted between paragraph blocks synthesized separately
+PARAGRAPH_GAP_SECONDS = 0.4
+
+_WORD_RE = re.compile(r"\w")
+
+
+def _is_speakable(tts_text):
+    # Pieces such as the "." left between two snippets would make TTS fail
+    return bool(tts_text) and _WORD_RE.search(tts_text) is not None
+
+
+def generate_express(api_key, text_model, audio_model, prompt, voice=gu.DEFAULT_VOICE, on_paragraph=None, quality_tier="any"):
+    """Writes a transcript and synthesizes it at the same time.
+
+    The transcript is streamed from the text model. As soon as a paragraph
+    block is complete, it is normalized and sent to TTS on a worker thread,
+    and the audio blocks are joined in order at the end. End-to-end latency
+    is therefore close to the slower of the two stages rather than their sum.
+
+    There is no manual editing step in this mode, and the duration check from
+    fit_transcript_to_duration is not applied because audio for the first
+    paragraphs is already being rendered when the last ones are written.
+
+    Args:
+        api_key: Gemini API key.
+        text_model: Model used to write the transcript.
+        audio_model: Model used to synthesize the audio.
+        prompt: The full prompt for the text model, e.g. from get_system_prompt.
+        voice: TTS voice name.
+        on_paragraph: Optional callable invoked with the transcript written
+            so far each time a paragraph block is completed.
+        quality_tier: Minimum quality tier for models set to "auto".
+
+    Returns:
+        A dictionary with "transcript" (str), "audio" (WAV bytes) and
+        "timings" (seconds spent until the text and the audio were done).
+    """
+    # Pick one TTS model for the whole episode so every block sounds alike
+    audio_model = gu.resolve_model("audio", audio_model, quality_tier)
+
+    start = time.perf_counter()
+    blocks = []
+    futures = []
+
+    with ThreadPoolExecutor(max_workers=EXPRESS_TTS_WORKERS) as executor:
+        try:
+            text_chunks = gu.stream_text_response(
+                api_key, text_model, prompt, quality_tier)
+            for block in tu.iter_paragraph_blocks(text_chunks):
+                blocks.append(block)
+                tts_text = tu.prepare_for_tts(
+                    block, model=audio_model, voice=voice)["tts_text"]
+                if _is_speakable(tts_text):
+                    futures.append(executor.submit(
+                        gu.get_audio_response, api_key, audio_model, tts_text, voice))
+                if on_paragraph is not None:
+                    on_paragraph("\n\n".join(blocks))
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        text_seconds = time.perf_counter() - start
+
+        audio_parts = [future.result() for future in futures]
+
+    if not blocks:
+        raise ValueError("The text model returned an empty transcript")
+    if any(part is None for part in audio_parts):
+        raise ValueError("Failed to generate audio for part of the transcript")
+
+    return {
+        "transcript": "\n\n".join(blocks),
+        "audio": au.concatenate_wav(audio_parts, PARAGRAPH_GAP_SECONDS),
+        "timings": {
+            "text": text_seconds,
+            "total": time.perf_counter() - start,
+        },
+    }
+
+
+def _synthesize_pcm(api_key, audio_model, tts_text, voice):
+    audio_data = gu.get_audio_response(api_key, audio_model, tts_text, voice)
+    if audio_data is None:
+        raise ValueError("Failed to generate audio for part of the transcript")
+    return au.read_wav(audio_data)
+
+
+def synthesize_with_segments(api_key, audio_model, transcript, show, voice=gu.DEFAULT_VOICE, quality_tier="any"):
+    """Synthesizes a transcript, reusing pre-rendered segments of a show.
+
+    Snippets registered for the show in the segment library, such as the
+    intro or sign-off, are detected in the transcript or inserted with
+    "{{name}}" markers. Their cached PCM is spliced in instead of being
+    synthesized again; only the text between them goes to TTS.
+
+    Text that continues a paragraph after a snippet keeps the paragraph's
+    tone tags, and the paragraph gap is only inserted where the transcript
+    has a paragraph break, not where a snippet sits inside a sentence.
+
+    Args:
+        api_key: Gemini API key.
+        audio_model: Model used to synthesize the audio.
+        transcript: The transcript as edited by the user.
+        show: Name of the show whose segments should be reused.
+        voice: TTS voice name.
+        quality_tier: Minimum quality tier if audio_model is "auto".
+
+    Returns:
+        A dictionary with "audio" (WAV bytes), "reused_segments" (names
+        of the segments that were spliced in, in order) and "model" (the
+        TTS model used, with "auto" resolved).
+    """
+    # Segments are cached per model, so resolve one for the whole episode
+    audio_model = gu.resolve_model("audio", audio_model, quality_tier)
+
+    segments = sl.list_segments(show)
+    reused_segments = []
+    # (future, whether a paragraph break precedes the part) in playback order
+    parts = []
+    paragraph_break = False
+    # Style of the paragraph the previous piece ended in, if it continues
+    style = None
+    with ThreadPoolExecutor(max_workers=EXPRESS_TTS_WORKERS) as executor:
+        for kind, value in sl.split_transcript(transcript, segments):
+            if kind == "segment":
+                reused_segments.append(value)
+                parts.append((executor.submit(
+                    sl.get_segment_audio, api_key, audio_model, voice, segments[value]), paragraph_break))
+                paragraph_break = False
+                continue
+
+            paragraphs = tu.split_paragraphs(value)
+            multiple = len(paragraphs) > 1
+            if multiple and not paragraphs[0].strip():
+                paragraph_break, style = True, None
+            elif style and not tu.extract_style(paragraphs[0]):
+                # The piece continues a paragraph whose tone tag came earlier
+                value = f"[{style}] {value}"
+
+            tts_text = tu.prepare_for_tts(
+                value, model=audio_model, voice=voice)["tts_text"]
+            if _is_speakable(tts_text):
+                parts.append((executor.submit(
+                    _synthesize_pcm, api_key, audio_model, tts_text, voice), paragraph_break))
+                paragraph_break = False
+            elif multiple:
+                # Unspoken text such as the blank line between two snippets
+                paragraph_break = True
+
+            if multiple and not paragraphs[-1].strip():
+                paragraph_break, style = True, None
+            elif multiple:
+                style = tu.extract_style(paragraphs[-1])
+            else:
+                style = tu.extract_style(paragraphs[0]) or style
+
+        pcm_parts = []
+        for future, gap in parts:
+            frames, parameters = future.result()
+            if gap and pcm_parts:
+                pcm_parts.append(
+                    (au.make_silence(PARAGRAPH_GAP_SECONDS, parameters), parameters))
+            pcm_parts.append((frames, parameters))
+
+    if not pcm_parts:
+        raise ValueError("Transcript has no speakable text")
+
+    return {
+        "audio": au.concatenate_pcm(pcm_parts),
+        "reused_segments": reused_segments,
+        "model": audio_model,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a podcast transcript and audio in one pass.")
+    parser.add_argument("source", help="Text file with the source material")
+    parser.add_argument("output", help="Path of the WAV file to write")
+    parser.add_argument("--text-model", default="gemini-2.0-flash")
+    parser.add_argument("--audio-model", default="gemini-2.5-flash-preview-tts")
+    parser.add_argument("--style", default="educational")
+    parser.add_argument("--duration", default="5-8 minutes")
+    parser.add_argument("--audience", default="general")
+    parser.add_argument("--voice", default=gu.DEFAULT_VOICE)
+    parser.add_argument(
+        "--quality-tier", default="any", choices=list(gu.QUALITY_TIERS),
+        help="Minimum model quality when a model is set to auto")
+    parser.add_argument(
+        "--api-key", help="Gemini API key (defaults to GEMINI_API_KEY)")
+    args = parser.parse_args()
+
+    with open(args.source, encoding="utf-8") as f:
+        source_text = f.read()
+
+    # Resolve "auto" once so the word target suits the model that reads it
+    audio_model = gu.resolve_model("audio", args.audio_model, args.quality_tier)
+    result = generate_express(
+        args.api_key,
+        args.text_model,
+        audio_model,
+        tu.get_system_prompt(source_text, args.style, args.duration,
+                             args.audience, audio_model, args.voice),
+        voice=args.voice,
+        quality_tier=args.quality_tier,
+    )
+
+    with open(args.output, "wb") as f:
+        f.write(result["audio"])
+    with open(f"{args.output}.txt", "w", encoding="utf-8") as f:
+        f.write(result["transcript"])
+
+    print(f"Transcript written in {result['timings']['text']:.1f}s, "
+          f"audio finished in {result['timings']['total']:.1f}s")
+    print(f"Saved {args.output} and {args.output}.txt")
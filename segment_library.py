@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+import artifact_store as store
+import audio_utils as au
+import gemini_utils as gu
+import transcript_utils as tu
+
+# Registered snippets per show and the index of their pre-rendered audio.
+# The audio itself is kept as raw PCM in the artifact store.
+SEGMENT_LIBRARY_PATH = Path(os.environ.get(
+    "PODCAST_SEGMENT_LIBRARY",
+    Path.home() / ".cache" / "podcast-creator" / "segments.json",
+))
+
+# Explicit insertion marker, e.g. "{{intro}}"
+_MARKER_RE = re.compile(r"\{\{\s*([\w-]+)\s*\}\}")
+_SEGMENT_NAME_RE = re.compile(r"^[\w-]+$")
+
+_library_lock = threading.Lock()
+
+
+def _load_library():
+    try:
+        library = json.loads(SEGMENT_LIBRARY_PATH.read_text())
+    except (OSError, ValueError):
+        library = {}
+    library.setdefault("shows", {})
+    library.setdefault("renders", {})
+    return library
+
+
+def _save_library(library):
+    SEGMENT_LIBRARY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(
+        dir=SEGMENT_LIBRARY_PATH.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(library, f, indent=2)
+    os.replace(temp_path, SEGMENT_LIBRARY_PATH)
+
+
+def register_segment(show: str, name: str, text: str) -> None:
+    """Registers a fixed snippet, such as an intro or sign-off, for a show.
+
+    Args:
+        show: The show the snippet belongs to.
+        name: Segment name, used in "{{name}}" markers. Letters, digits,
+            underscores and hyphens only.
+        text: The exact text of the snippet.
+
+    Raises:
+        ValueError: If the show, name or text is invalid.
+    """
+    if not show or not show.strip():
+        raise ValueError("Show name is required")
+    if not _SEGMENT_NAME_RE.match(name or ""):
+        raise ValueError(
+            "Segment name may only contain letters, digits, underscores and hyphens")
+    if not text or not text.strip():
+        raise ValueError("Segment text is required")
+
+    with _library_lock:
+        library = _load_library()
+        library["shows"].setdefault(show.strip(), {})[name] = text.strip()
+        _save_library(library)
+
+
+def remove_segment(show: str, name: str) -> None:
+    """Removes a snippet from a show; its rendered audio stays cached."""
+    with _library_lock:
+        library = _load_library()
+        library["shows"].get(show, {}).pop(name, None)
+        _save_library(library)
+
+
+def list_segments(show: str) -> dict[str, str]:
+    """Returns the snippets registered for a show, keyed by segment name."""
+    with _library_lock:
+        return dict(_load_library()["shows"].get(show, {}))
+
+
+def list_shows() -> list[str]:
+    """Returns the names of all shows with registered snippets."""
+    with _library_lock:
+        return sorted(_load_library()["shows"])
+
+
+def _render_key(text, model, voice):
+    return hashlib.sha256(f"{model}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+
+def get_segment_audio(api_key, model, voice, text) -> tuple[bytes, dict[str, int]]:
+    """Returns a snippet's audio as raw PCM, rendering it only the first time.
+
+    Args:
+        api_key: Gemini API key, used only if the snippet is not cached.
+        model: TTS model name (not "auto"; renders are cached per model).
+        voice: TTS voice name.
+        text: The snippet text.
+
+    Returns:
+        A (frames, parameters) tuple as returned by audio_utils.read_wav.
+    """
+    key = _render_key(text, model, voice)
+    with _library_lock:
+        render = _load_library()["renders"].get(key)
+    if render is not None:
+        try:
+            return store.load_artifact(render["artifact_id"]), render["parameters"]
+        except FileNotFoundError:
+            pass  # The store was cleaned up; render the snippet again
+
+    tts_text = tu.prepare_for_tts(text, model=model, voice=voice)["tts_text"]
+    audio_data = gu.get_audio_response(api_key, model, tts_text, voice)
+    if audio_data is None:
+        raise ValueError(f"Failed to render segment audio for: {text[:40]!r}")
+    frames, parameters = au.read_wav(audio_data)
+
+    artifact_id = store.save_artifact(frames, "pcm")
+    with _library_lock:
+        library = _load_library()
+        library["renders"][key] = {
+            "artifact_id": artifact_id, "parameters": parameters}
+        _save_library(library)
+    return frames, parameters
+
+
+def split_transcript(transcript: str, segments: dict[str, str]) -> list[tuple[str, str]]:
+    """Splits a transcript around library snippets.
+
+    Snippets are found through explicit "{{name}}" markers and by detecting
+    their text in the transcript, ignoring case and whitespace differences.
+
+    Args:
+        transcript: The transcript to split.
+        segments: Snippets keyed by segment name, as from list_segments.
+
+    Returns:
+        A list of ("text", text) and ("segment", name) pieces in order.
+
+    Raises:
+        ValueError: If a marker refers to an unknown segment.
+    """
+    alternatives = [_MARKER_RE.pattern]
+    names_by_text = {}
+    # Longer snippets first so that one snippet containing another wins
+    for name, text in sorted(segments.items(), key=lambda item: -len(item[1])):
+        words = text.split()
+        if words:
+            # Only match whole words, so "Thanks" is not found in "Thanksgiving"
+            alternative = r"\s+".join(re.escape(word) for word in words)
+            if re.match(r"\w", words[0]):
+                alternative = r"(?<!\w)" + alternative
+            if re.search(r"\w$", words[-1]):
+                alternative += r"(?!\w)"
+            alternatives.append(alternative)
+            names_by_text[" ".join(words).lower()] = name
+    pattern = re.compile("|".join(f"(?:{alt})" for alt in alternatives), re.IGNORECASE)
+
+    pieces = []
+    position = 0
+    for match in pattern.finditer(transcript):
+        if match.start() > position:
+            pieces.append(("text", transcript[position:match.start()]))
+        if match.group(1) is not None:
+            name = match.group(1)
+            if name not in segments:
+                raise ValueError(f"Unknown segment marker: {{{{{name}}}}}")
+        else:
+            name = names_by_text[" ".join(match.group(0).split()).lower()]
+        pieces.append(("segment", name))
+        position = match.end()
+    if position < len(transcript):
+        pieces.append(("text", transcript[position:]))
+    return pieces
@@ -3,41 +3,63 @@ from pathlib import Path
 
 # Import with error handling
 try:
+    import artifact_store as store
+    import audio_server
+    import audio_utils as au
     import gemini_utils as gu
+    import podcast_pipeline as pp
+    import segment_library as sl
+    import transcript_utils as tu
 except ImportError:
     st.error(
         "gemini_utils module not found. Please ensure it's installed and available.")
     st.stop()
 
+# Streamlit cannot serve extra routes on its own origin, so the audio server
+# only runs when it has a public URL; otherwise Streamlit serves the file
+if audio_server.AUDIO_SERVER_URL:
+    audio_server.ensure_running()
+
 st.title("🎙️ Podcast Generator")
 st.markdown("This is a playground to test a POC for a podcast generator.")
 
-# Initialize session state variables
-if 'transcript' not in st.session_state:
-    st.session_state.transcript = None
+# Initialize session state variables. Generated artifacts live in the on-disk
+# artifact store and the session only keeps their IDs. Episode audio is still
+# loaded into server memory by the player unless AUDIO_SERVER_URL is set.
+if 'transcript_id' not in st.session_state:
+    st.session_state.transcript_id = None
 if 'is_transcript_generated' not in st.session_state:
     st.session_state.is_transcript_generated = False
-if 'generated_audio' not in st.session_state:
-    st.session_state.generated_audio = None
+if 'audio_id' not in st.session_state:
+    st.session_state.audio_id = None
 
 # Configuration section
 st.subheader("⚙️ Configuration")
-col1, col2 = st.columns(2)
+col1, col2, col3 = st.columns(3)
 
 with col1:
     TEXT_MODEL = st.selectbox(
         "Select the text model to use",
-        ["gemma-3n-e4b-it", "gemini-2.0-flash", "gemini-2.5-flash-preview-05-20"],
+        ["gemma-3n-e4b-it", "gemini-2.0-flash",
+            "gemini-2.5-flash-preview-05-20", "auto"],
         key="text_model"
     )
 
 with col2:
     AUDIO_MODEL = st.selectbox(
         "Select the audio model to use",
-        ["gemini-2.5-flash-preview-tts", "gemini-2.5-pro-preview-tts"],
+        ["gemini-2.5-flash-preview-tts", "gemini-2.5-pro-preview-tts", "auto"],
         key="audio_model"
     )
 
+with col3:
+    QUALITY_TIER = st.selectbox(
+        "Quality tier",
+        ["any", "standard", "high"],
+        key="quality_tier",
+        help="Minimum model quality when a model is set to auto, which picks the fastest healthy model"
+    )
+
 API_KEY = st.text_input(
     "🔑 Enter your Gemini API key",
     type="password",
@@ -45,6 +67,12 @@ API_KEY = st.text_input(
     help="Your API key is required to generate transcripts and audio"
 )
 
+SHOW_PROMPT = st.toggle(
+    "🐞 Show system prompt",
+    key="show_prompt",
+    help="Display the prompt sent to the text model, for debugging"
+)
+
 
 # Podcast customization
 st.subheader("🎙️ Podcast Settings")
@@ -73,6 +101,34 @@ with col3:
         help="Who is the primary audience for this podcast?"
     )
 
+# Segment library
+with st.expander("🧩 Segment Library"):
+    st.caption(
+        "Register fixed snippets such as the intro or sign-off. They are rendered once per voice and model and reused in every episode of the show, either where their text appears in the transcript or where a `{{name}}` marker is placed.")
+    SHOW = st.text_input(
+        "Show",
+        key="show",
+        placeholder="Leave empty to synthesize the whole transcript",
+        help="Episodes of this show reuse its pre-rendered segments"
+    ).strip()
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        segment_name = st.text_input("Segment name", placeholder="intro")
+    with col2:
+        segment_text = st.text_input(
+            "Segment text", placeholder="Welcome to the show...")
+
+    if st.button("💾 Save Segment", disabled=not SHOW):
+        try:
+            sl.register_segment(SHOW, segment_name, segment_text)
+            st.success(f"✅ Segment '{segment_name}' saved.")
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
+    for name, text in sl.list_segments(SHOW).items():
+        st.markdown(f"- `{{{{{name}}}}}`: {text}")
+
 
 def validate_inputs(text_input, api_key):
     """Validate user inputs before processing"""
@@ -90,90 +146,111 @@ def validate_inputs(text_input, api_key):
     return errors
 
 
-def get_system_prompt(text_input, podcast_style="educational", target_duration="5-8 minutes", target_audience="general"):
-    """Generate system prompt for transcript creation"""
-    min_target_duration_minutes = int(target_duration.split()[0].split("-")[0])
-    max_target_duration_minutes = int(target_duration.split()[0].split("-")[1])
-    target_duration_words = min_target_duration_minutes * 100
-    return f"""
-You are an expert podcast script writer specializing in creating engaging, educational audio content. Your task is to transform the provided text into a natural, conversational podcast transcript.
-
-**PODCAST SPECIFICATIONS:**
-- Style: {podcast_style} podcast
-- Target Duration: {target_duration} (approximately {target_duration_words} words)
-- Target Audience: {target_audience} audience
-- Format: Single narrator speaking directly to listeners
-
-**SCRIPT STRUCTURE:**
-1. **Hook (30-45 seconds)**: Start with an intriguing question, surprising fact, or compelling statement that grabs attention about the topic
-2. **Introduction (30-60 seconds)**: Briefly introduce the topic and what listeners will learn
-3. **Main Content ({min_target_duration_minutes - 2}-{max_target_duration_minutes -2} minutes)**: Present the key information in 2-4 digestible segments with smooth transitions
-4. **Conclusion (30-45 seconds)**: Summarize key takeaways and end with a thought-provoking statement
-
-**WRITING STYLE REQUIREMENTS:**
-- Use conversational, natural language as if speaking to a friend
-- Include rhetorical questions to engage listeners
-- Add smooth transitions between topics ("Now that we've covered X, let's explore Y...")
-- Use analogies and examples to explain complex concepts
-- Include brief pauses indicated by natural sentence breaks
-- Vary sentence length for natural rhythm
-- Use active voice and present tense when possible
-
-**CONTENT GUIDELINES:**
-- Make complex ideas accessible without dumbing them down
-- Include specific examples or case studies when relevant
-- Add context for why this information matters to listeners
-- Build concepts progressively from simple to complex
-- Include actionable insights or takeaways
-
-**FORMATTING RULES:**
-- Write in plain text only (no markdown, HTML, or special characters)
-- Use standard punctuation for natural speech patterns
-- Do not include stage directions, speaker labels, or technical notes
-- Do not use ALL CAPS, emojis, or excessive punctuation
-- Write as a continuous script, not bullet points
-- Do not include scene directions, speaker labels, or technical notes
-- Do not include any audio/music/sound effects/background instructions.
-- Enclose all tone and voice instructions in [ and ] tags.
-
-**TONE AND VOICE:**
-- Enthusiastic but not overly excited
-- Authoritative yet approachable
-- Curious and engaging
-- Professional but conversational
-- Add Tone and voice instructions in the transcript.
-
-
-Transform this source material into an engaging podcast script:
-
-{text_input}
-
-Remember: This will be converted to audio, so prioritize clarity, natural flow, and listener engagement over visual formatting."""
-
-
-def generate_transcript(text_input, api_key, model, podcast_style, target_duration, target_audience):
+def generate_transcript(text_input, api_key, model, podcast_style, target_duration, target_audience, audio_model=None, show_prompt=False, quality_tier="any"):
     """Generate transcript with error handling"""
     try:
+        # Size the transcript for the TTS model the router would pick for "auto"
+        audio_model = gu.resolve_model("audio", audio_model, quality_tier)
         with st.spinner("🔄 Generating transcript..."):
-            formatted_prompt = get_system_prompt(
-                text_input, podcast_style, target_duration, target_audience)
-            st.write(formatted_prompt)
-            response = gu.get_text_response(api_key, model, formatted_prompt)
-            return response.strip(), None
+            formatted_prompt = tu.get_system_prompt(
+                text_input, podcast_style, target_duration, target_audience, audio_model, gu.DEFAULT_VOICE)
+            if show_prompt:
+                with st.expander("System prompt"):
+                    st.text(formatted_prompt)
+            response = gu.get_text_response(
+                api_key, model, formatted_prompt, quality_tier)
+
+        # Check the spoken length before any audio is rendered
+        with st.spinner("📏 Checking transcript length..."):
+            fitted = tu.fit_transcript_to_duration(
+                response.strip(), target_duration,
+                lambda prompt: gu.get_text_response(
+                    api_key, model, prompt, quality_tier),
+                audio_model, gu.DEFAULT_VOICE)
+        if fitted["adjusted"]:
+            st.info(
+                f"📏 Resized transcript from {tu.format_duration(fitted['original_seconds'])} "
+                f"to about {tu.format_duration(fitted['estimated_seconds'])} to fit {target_duration}.")
+        if fitted["warning"]:
+            st.warning(f"⚠️ {fitted['warning']}")
+        return fitted["transcript"], None
     except Exception as e:
         return None, f"Error generating transcript: {str(e)}"
 
 
-def generate_podcast(transcript, api_key, model):
+def generate_podcast(transcript, api_key, model, quality_tier="any", show=""):
     """Generate podcast audio with error handling"""
     try:
         with st.spinner("🎵 Generating podcast audio..."):
-            audio_data = gu.get_audio_response(api_key, model, transcript)
+            # Strip tone tags, markdown and extra whitespace before TTS
+            prepared = tu.prepare_for_tts(
+                transcript, model=gu.resolve_model("audio", model, quality_tier),
+                voice=gu.DEFAULT_VOICE)
+            if not prepared["tts_text"]:
+                return None, "Transcript has no speakable text after normalization."
+
+            # Splice in the show's pre-rendered segments instead of
+            # synthesizing them again
+            reused_segments = []
+            if show:
+                result = pp.synthesize_with_segments(
+                    api_key, model, transcript, show, quality_tier=quality_tier)
+                audio_data = result["audio"]
+                reused_segments = result["reused_segments"]
+                spoken_by = result["model"]
+                if reused_segments:
+                    st.info(
+                        f"🧩 Reused segments: {', '.join(reused_segments)}")
+            else:
+                audio_data = gu.get_audio_response(
+                    api_key, model, prepared["tts_text"], quality_tier=quality_tier)
+                # With "auto" the audio may come from a hedged or failover
+                # model, so it cannot be attributed to one model for calibration
+                spoken_by = None if model == gu.AUTO_MODEL else model
+
+            # Calibrate the speech rate used for future duration estimates
+            duration = au.get_wav_duration(audio_data) if audio_data else None
+            if duration and spoken_by and not reused_segments:
+                tu.record_speech_rate(
+                    spoken_by, gu.DEFAULT_VOICE, prepared["text"], duration)
             return audio_data, None
     except Exception as e:
         return None, f"Error generating podcast: {str(e)}"
 
 
+def generate_express_podcast(text_input, api_key, text_model, audio_model, podcast_style, target_duration, target_audience, quality_tier="any"):
+    """Generate transcript and audio in one overlapped pass with error handling"""
+    try:
+        # Resolve "auto" once so the word target suits the model that reads it
+        audio_model = gu.resolve_model("audio", audio_model, quality_tier)
+        with st.spinner("⚡ Writing transcript and generating audio..."):
+            formatted_prompt = tu.get_system_prompt(
+                text_input, podcast_style, target_duration, target_audience, audio_model, gu.DEFAULT_VOICE)
+            preview = st.empty()
+            # Audio for each paragraph is rendered while the next one is written
+            result = pp.generate_express(
+                api_key, text_model, audio_model, formatted_prompt,
+                on_paragraph=lambda transcript: preview.caption(transcript),
+                quality_tier=quality_tier)
+            preview.empty()
+            return result, None
+    except Exception as e:
+        return None, f"Error in express generation: {str(e)}"
+
+
+def play_episode(episode_id):
+    """Render an audio player for a stored episode"""
+    if not store.artifact_path(episode_id).exists():
+        st.warning("This episode has expired from the cache. Please generate it again.")
+    elif audio_server.AUDIO_SERVER_URL:
+        # Streamed from the audio server, with Range support for seeking
+        st.audio(audio_server.episode_url(episode_id), format="audio/wav")
+    else:
+        # Streamlit's media file manager reads the whole episode into server
+        # memory while a player shows it, and its URL does not support Range
+        st.audio(str(store.artifact_path(episode_id)), format="audio/wav")
+
+
 def save_binary_file(file_name, data):
     """Save binary file with proper error handling"""
     try:
@@ -185,13 +262,22 @@ def save_binary_file(file_name, data):
         return None, f"Error saving file: {str(e)}"
 
 
+def load_transcript(transcript_id):
+    """Load a stored transcript, or an empty one if it has expired"""
+    if not transcript_id:
+        return ""
+    try:
+        return store.load_text(transcript_id)
+    except FileNotFoundError:
+        return ""
+
+
 def get_edited_transcript():
     """Get edited transcript from text area"""
     return st.text_area(
         "📝 Edit the transcript",
         height=200,
-        key="edited_transcript",
-        value=st.session_state.transcript if st.session_state.transcript else "",
+        value=load_transcript(st.session_state.transcript_id),
         help="You can edit the generated transcript before creating the podcast"
     )
 
@@ -221,23 +307,50 @@ if validation_errors:
     for error in validation_errors:
         st.error(f"❌ {error}")
 
-generate_transcript_button = st.button(
-    "🔄 Generate Transcript",
-    disabled=bool(validation_errors),
-    help="Generate a podcast transcript from your input text"
-)
+col1, col2 = st.columns(2)
+
+with col1:
+    generate_transcript_button = st.button(
+        "🔄 Generate Transcript",
+        disabled=bool(validation_errors),
+        help="Generate a podcast transcript from your input text"
+    )
+
+with col2:
+    express_button = st.button(
+        "⚡ Express: Transcript + Audio",
+        disabled=bool(validation_errors),
+        help="Write the transcript and generate audio at the same time, without an editing step"
+    )
 
 if generate_transcript_button and not validation_errors:
     transcript, error = generate_transcript(
-        text_input, API_KEY, TEXT_MODEL, podcast_style, target_duration, target_audience)
+        text_input, API_KEY, TEXT_MODEL, podcast_style, target_duration, target_audience, AUDIO_MODEL, SHOW_PROMPT, QUALITY_TIER)
 
     if error:
         st.error(error)
     else:
-        st.session_state.transcript = transcript
+        st.session_state.transcript_id = store.save_text(transcript)
         st.session_state.is_transcript_generated = True
         st.success("✅ Transcript generated successfully!")
 
+if express_button and not validation_errors:
+    result, error = generate_express_podcast(
+        text_input, API_KEY, TEXT_MODEL, AUDIO_MODEL, podcast_style, target_duration, target_audience, QUALITY_TIER)
+
+    if error:
+        st.error(error)
+    else:
+        st.session_state.transcript_id = store.save_text(result["transcript"])
+        st.session_state.is_transcript_generated = True
+        st.session_state.audio_id = store.save_artifact(
+            result["audio"], "wav")
+        st.success(
+            f"✅ Transcript and podcast generated in {result['timings']['total']:.0f}s!")
+
+        st.subheader("🔊 Listen to Your Podcast")
+        play_episode(st.session_state.audio_id)
+
 # Show transcript editing section if transcript is generated
 if st.session_state.is_transcript_generated:
     st.subheader("✏️ Edit Transcript")
@@ -249,6 +362,13 @@ if st.session_state.is_transcript_generated:
     if not edited_transcript.strip():
         st.warning(
             "⚠️ Transcript is empty. Please add content before generating podcast.")
+    else:
+        prepared = tu.prepare_for_tts(
+            edited_transcript, model=gu.resolve_model("audio", AUDIO_MODEL, QUALITY_TIER),
+            voice=gu.DEFAULT_VOICE)
+        st.caption(
+            f"Words: {prepared['word_count']:,} · Estimated length: "
+            f"{tu.format_duration(prepared['estimated_seconds'])}")
 
     generate_podcast_button = st.button(
         "🎵 Generate Podcast",
@@ -258,22 +378,27 @@ if st.session_state.is_transcript_generated:
 
     if generate_podcast_button and edited_transcript.strip():
         podcast_data, error = generate_podcast(
-            edited_transcript, API_KEY, AUDIO_MODEL)
+            edited_transcript, API_KEY, AUDIO_MODEL, QUALITY_TIER, SHOW)
 
         if error:
             st.error(error)
+        elif podcast_data is None:
+            st.error("Failed to generate podcast audio")
         else:
-            st.session_state.generated_audio = podcast_data
+            # Keep only the episode ID in the session; the file is read from
+            # disk when the player is rendered
+            st.session_state.audio_id = store.save_artifact(
+                podcast_data, "wav")
             st.success("✅ Podcast generated successfully!")
 
             # Audio playback
             st.subheader("🔊 Listen to Your Podcast")
-            st.audio(podcast_data, format="audio/wav")
+            play_episode(st.session_state.audio_id)
 
 # Display existing audio if available
-elif st.session_state.generated_audio:
+elif st.session_state.audio_id:
     st.subheader("🔊 Your Generated Podcast")
-    st.audio(st.session_state.generated_audio, format="audio/wav")
+    play_episode(st.session_state.audio_id)
 
 st.markdown("---")
 st.markdown("*Built with Streamlit and Gemini AI*")
@@ -0,0 +1,529 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Average narration pace used to estimate how long a transcript will take to speak.
+DEFAULT_WORDS_PER_MINUTE = 150
+
+# Calibrated speaking rates in words per minute, excluding punctuation pauses.
+# Keys are (model, voice); a voice of None is the fallback for the model.
+# Rates are refined at runtime from real audio via record_speech_rate and
+# persisted to SPEECH_RATES_PATH so that calibration survives restarts.
+SPEECH_RATES = {
+    ("gemini-2.5-flash-preview-tts", None): 160,
+    ("gemini-2.5-pro-preview-tts", None): 150,
+}
+_DEFAULT_SPEECH_RATES = dict(SPEECH_RATES)
+SPEECH_RATES_PATH = Path(os.environ.get(
+    "PODCAST_SPEECH_RATES",
+    Path.home() / ".cache" / "podcast-creator" / "speech_rates.json",
+))
+
+# Extra silence, in seconds, that TTS voices typically insert after punctuation.
+_PAUSE_SECONDS = {
+    ".": 0.35,
+    "!": 0.35,
+    "?": 0.4,
+    ",": 0.15,
+    ";": 0.2,
+    ":": 0.2,
+    "—": 0.25,
+    "–": 0.25,
+    "...": 0.5,
+    "…": 0.5,
+}
+_PARAGRAPH_PAUSE_SECONDS = 0.6
+# Average punctuation pause per word in conversational scripts, used to turn a
+# target duration into a word count before any text exists.
+_AVERAGE_PAUSE_SECONDS_PER_WORD = 0.045
+
+# Weight of a new measurement when updating a calibrated speech rate.
+_CALIBRATION_WEIGHT = 0.3
+
+_speech_rates_lock = threading.Lock()
+_speech_rates_loaded = False
+
+# Markdown links must be rewritten before tone tags are extracted, otherwise the
+# "[text]" part of "[text](url)" would be mistaken for a tone instruction.
+_LINK_RE = re.compile(r"\[([^\[\]\n]*)\]\([^)\n]*\)")
+_TONE_TAG_RE = re.compile(r"\[([^\[\]\n]{1,80})\]")
+_HTML_TAG_RE = re.compile(r"</?[A-Za-z][^<>\n]*>")
+_CODE_FENCE_RE = re.compile(r"^\s*```[^\n]*$", re.MULTILINE)
+_INLINE_CODE_RE = re.compile(r"`([^`\n]*)`")
+_HEADING_RE = re.compile(r"^[ \t]*#{1,6}[ \t]*", re.MULTILINE)
+_RULE_RE = re.compile(r"^[ \t]*([-*_])(?:[ \t]*\1){2,}[ \t]*$", re.MULTILINE)
+_BLOCKQUOTE_RE = re.compile(r"^[ \t]*>[ \t]?", re.MULTILINE)
+_LIST_MARKER_RE = re.compile(r"^[ \t]*(?:[-*+•]|\d{1,3}[.)])[ \t]+", re.MULTILINE)
+_STRONG_RE = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_EMPHASIS_RE = re.compile(r"(?<![\w*])\*(?=\S)([^*\n]+?)(?<=\S)\*(?![\w*])")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r" +([,.;:!?])")
+_PAUSE_RE = re.compile(r"\.\.\.|…|[.!?]|[,;:—–]")
+_DURATION_RANGE_RE = re.compile(r"(\d+)\s*(?:-\s*(\d+))?")
+# Segment library markers such as "{{intro}}"; any left at this stage were
+# not resolved to a show's segment and must not be read aloud.
+_SEGMENT_MARKER_RE = re.compile(r"\{\{\s*[\w-]+\s*\}\}")
+
+# Paragraphs shorter than this are merged with the next one before they are
+# sent to TTS, to avoid paying per-request overhead for a single sentence.
+MIN_TTS_BLOCK_WORDS = 60
+
+
+def get_system_prompt(text_input, podcast_style="educational", target_duration="5-8 minutes", target_audience="general", audio_model=None, voice=None):
+    """Generate system prompt for transcript creation"""
+    min_target_duration_minutes = int(target_duration.split()[0].split("-")[0])
+    max_target_duration_minutes = int(target_duration.split()[0].split("-")[1])
+    # Same speech rate as the duration check, so a compliant script passes it
+    target_duration_words = get_target_word_count(
+        target_duration, audio_model, voice)
+    return f"""
+You are an expert podcast script writer specializing in creating engaging, educational audio content. Your task is to transform the provided text into a natural, conversational podcast transcript.
+
+**PODCAST SPECIFICATIONS:**
+- Style: {podcast_style} podcast
+- Target Duration: {target_duration} (approximately {target_duration_words} words)
+- Target Audience: {target_audience} audience
+- Format: Single narrator speaking directly to listeners
+
+**SCRIPT STRUCTURE:**
+1. **Hook (30-45 seconds)**: Start with an intriguing question, surprising fact, or compelling statement that grabs attention about the topic
+2. **Introduction (30-60 seconds)**: Briefly introduce the topic and what listeners will learn
+3. **Main Content ({min_target_duration_minutes - 2}-{max_target_duration_minutes -2} minutes)**: Present the key information in 2-4 digestible segments with smooth transitions
+4. **Conclusion (30-45 seconds)**: Summarize key takeaways and end with a thought-provoking statement
+
+**WRITING STYLE REQUIREMENTS:**
+- Use conversational, natural language as if speaking to a friend
+- Include rhetorical questions to engage listeners
+- Add smooth transitions between topics ("Now that we've covered X, let's explore Y...")
+- Use analogies and examples to explain complex concepts
+- Include brief pauses indicated by natural sentence breaks
+- Vary sentence length for natural rhythm
+- Use active voice and present tense when possible
+
+**CONTENT GUIDELINES:**
+- Make complex ideas accessible without dumbing them down
+- Include specific examples or case studies when relevant
+- Add context for why this information matters to listeners
+- Build concepts progressively from simple to complex
+- Include actionable insights or takeaways
+
+**FORMATTING RULES:**
+- Write in plain text only (no markdown, HTML, or special characters)
+- Use standard punctuation for natural speech patterns
+- Do not include stage directions, speaker labels, or technical notes
+- Do not use ALL CAPS, emojis, or excessive punctuation
+- Write as a continuous script, not bullet points
+- Do not include scene directions, speaker labels, or technical notes
+- Do not include any audio/music/sound effects/background instructions.
+- Enclose all tone and voice instructions in [ and ] tags.
+
+**TONE AND VOICE:**
+- Enthusiastic but not overly excited
+- Authoritative yet approachable
+- Curious and engaging
+- Professional but conversational
+- Add Tone and voice instructions in the transcript.
+
+Transform this source material into an engaging podcast script:
+
+{text_input}
+
+Remember: This will be converted to audio, so prioritize clarity, natural flow, and listener engagement over visual formatting."""
+
+
+def strip_markdown(text: str) -> str:
+    """Removes markdown and HTML formatting while keeping the spoken words.
+
+    Args:
+        text: Transcript text that may contain markdown.
+
+    Returns:
+        The text with links, emphasis, headings, list markers, code fences,
+        rules and HTML tags removed. Line structure is preserved.
+    """
+    text = _LINK_RE.sub(r"\1", text)
+    text = _HTML_TAG_RE.sub("", text)
+    text = _CODE_FENCE_RE.sub("", text)
+    text = _INLINE_CODE_RE.sub(r"\1", text)
+    text = _RULE_RE.sub("", text)
+    text = _HEADING_RE.sub("", text)
+    text = _BLOCKQUOTE_RE.sub("", text)
+    text = _LIST_MARKER_RE.sub("", text)
+    text = _STRONG_RE.sub(r"\2", text)
+    text = _EMPHASIS_RE.sub(r"\1", text)
+    return text
+
+
+def _clean_paragraph(paragraph: str) -> str:
+    paragraph = _WHITESPACE_RE.sub(" ", paragraph).strip()
+    return _SPACE_BEFORE_PUNCT_RE.sub(r"\1", paragraph)
+
+
+def split_paragraphs(text: str) -> list[str]:
+    """Splits text at blank lines.
+
+    A leading or trailing blank line yields an empty first or last item, so
+    callers can tell whether the text starts or ends a paragraph.
+    """
+    return _PARAGRAPH_BREAK_RE.split(text)
+
+
+def extract_style(paragraph: str) -> str | None:
+    """Returns the tone tags of a paragraph as one style hint, or None."""
+    tags = []
+    for tag in _TONE_TAG_RE.findall(_LINK_RE.sub(r"\1", paragraph)):
+        tag = _clean_paragraph(tag)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return "; ".join(tags) or None
+
+
+def normalize_transcript(transcript: str) -> dict:
+    """Normalizes a transcript into paragraph segments with style hints.
+
+    Tone instructions written as "[...]" are removed from the spoken text and
+    collected per paragraph, markdown and unresolved "{{name}}" segment
+    markers are stripped and whitespace is collapsed.
+
+    Args:
+        transcript: The raw transcript as produced by the LLM or the editor.
+
+    Returns:
+        A dictionary with "segments" (a list of {"text", "style"} dicts, where
+        "style" is None for paragraphs without tone tags), "text" (the spoken
+        text only) and "word_count".
+    """
+    text = _SEGMENT_MARKER_RE.sub(" ", transcript or "")
+    text = _LINK_RE.sub(r"\1", text)
+    segments = []
+    word_count = 0
+    for paragraph in split_paragraphs(text):
+        style = extract_style(paragraph)
+        # Tags are removed first so that markdown following a tag on the same
+        # line, like "[excited] # Heading", is still recognized.
+        paragraph = strip_markdown(_TONE_TAG_RE.sub(" ", paragraph))
+        spoken = _clean_paragraph(paragraph)
+        if not spoken:
+            continue
+        word_count += len(spoken.split())
+        segments.append({"text": spoken, "style": style})
+
+    return {
+        "segments": segments,
+        "text": "\n\n".join(segment["text"] for segment in segments),
+        "word_count": word_count,
+    }
+
+
+def iter_paragraph_blocks(text_chunks, min_words: int = MIN_TTS_BLOCK_WORDS):
+    """Groups streamed text into complete paragraph blocks.
+
+    A block is yielded as soon as the paragraph break that ends it arrives, so
+    downstream work can start while the rest of the text is still being
+    written. Short paragraphs are merged until a block has min_words words.
+
+    Args:
+        text_chunks: Iterable of text pieces, e.g. from a streaming LLM call.
+        min_words: Minimum number of words per block, except the last one.
+
+    Yields:
+        Blocks of one or more paragraphs separated by blank lines.
+    """
+    buffer = ""
+    block = []
+    block_words = 0
+    for chunk in text_chunks:
+        buffer += chunk
+        paragraphs = _PARAGRAPH_BREAK_RE.split(buffer)
+        # The last piece may still be growing; keep it for the next chunk
+        buffer = paragraphs.pop()
+        for paragraph in paragraphs:
+            if not paragraph.strip():
+                continue
+            block.append(paragraph.strip())
+            block_words += len(paragraph.split())
+            if block_words >= min_words:
+                yield "\n\n".join(block)
+                block = []
+                block_words = 0
+
+    if buffer.strip():
+        block.append(buffer.strip())
+    if block:
+        yield "\n\n".join(block)
+
+
+def render_tts_text(segments: list[dict], style_hints: bool = True) -> str:
+    """Renders normalized segments into the text sent to the TTS model.
+
+    A style hint is emitted once at the start of a paragraph, and only when it
+    differs from the previous paragraph's hint.
+
+    Args:
+        segments: Segments as returned by normalize_transcript.
+        style_hints: Whether to keep the tone instructions at all.
+
+    Returns:
+        The text to synthesize.
+    """
+    paragraphs = []
+    previous_style = None
+    for segment in segments:
+        style = segment["style"] if style_hints else None
+        if style and style != previous_style:
+            paragraphs.append(f"[{style}] {segment['text']}")
+        else:
+            paragraphs.append(segment["text"])
+        previous_style = style
+    return "\n\n".join(paragraphs)
+
+
+def estimate_duration_seconds(word_count: int, words_per_minute: int = DEFAULT_WORDS_PER_MINUTE) -> float:
+    """Estimates spoken duration in seconds from a word count."""
+    return word_count * 60.0 / words_per_minute
+
+
+def _load_speech_rates():
+    # Called with _speech_rates_lock held
+    global _speech_rates_loaded
+    if _speech_rates_loaded:
+        return
+    _speech_rates_loaded = True
+    try:
+        entries = json.loads(SPEECH_RATES_PATH.read_text())
+    except (OSError, ValueError):
+        return
+    for entry in entries:
+        try:
+            SPEECH_RATES[(entry["model"], entry["voice"])] = float(
+                entry["words_per_minute"])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def _save_speech_rates():
+    # Called with _speech_rates_lock held. Calibration is best effort; a
+    # read-only disk must not break generation.
+    try:
+        SPEECH_RATES_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=SPEECH_RATES_PATH.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            # Only calibrated rates are saved, so new defaults take effect
+            json.dump([{"model": model, "voice": voice, "words_per_minute": rate}
+                       for (model, voice), rate in SPEECH_RATES.items()
+                       if _DEFAULT_SPEECH_RATES.get((model, voice)) != rate], f)
+        os.replace(temp_path, SPEECH_RATES_PATH)
+    except OSError:
+        pass
+
+
+def _lookup_speech_rate(model, voice):
+    rate = SPEECH_RATES.get((model, voice)) or SPEECH_RATES.get((model, None))
+    return rate or DEFAULT_WORDS_PER_MINUTE
+
+
+def get_speech_rate(model: str | None = None, voice: str | None = None) -> float:
+    """Returns the calibrated words per minute for a TTS model and voice."""
+    with _speech_rates_lock:
+        _load_speech_rates()
+        return _lookup_speech_rate(model, voice)
+
+
+def _pause_seconds(text: str) -> float:
+    pauses = sum(_PAUSE_SECONDS[mark] for mark in _PAUSE_RE.findall(text))
+    return pauses + _PARAGRAPH_PAUSE_SECONDS * text.count("\n\n")
+
+
+def estimate_speech_duration(text: str, model: str | None = None, voice: str | None = None) -> float:
+    """Predicts how long normalized text takes to speak, in seconds.
+
+    Combines the word count at the calibrated speech rate for the model and
+    voice with the pauses implied by punctuation and paragraph breaks.
+
+    Args:
+        text: Spoken text, as in the "text" key of normalize_transcript.
+        model: The TTS model that will read the text.
+        voice: The TTS voice that will read the text.
+
+    Returns:
+        The estimated duration in seconds.
+    """
+    words_per_minute = get_speech_rate(model, voice)
+    return estimate_duration_seconds(len(text.split()), words_per_minute) + _pause_seconds(text)
+
+
+def record_speech_rate(model: str, voice: str | None, text: str, seconds: float) -> None:
+    """Refines the calibrated speech rate from a finished audio rendering.
+
+    Args:
+        model: The TTS model that produced the audio.
+        voice: The voice that produced the audio.
+        text: The spoken text that was synthesized.
+        seconds: The measured duration of the resulting audio.
+    """
+    word_count = len(text.split())
+    speaking_seconds = seconds - _pause_seconds(text)
+    if word_count == 0 or speaking_seconds <= 0:
+        return
+    measured = word_count * 60.0 / speaking_seconds
+    with _speech_rates_lock:
+        _load_speech_rates()
+        current = _lookup_speech_rate(model, voice)
+        SPEECH_RATES[(model, voice)] = (
+            current + _CALIBRATION_WEIGHT * (measured - current))
+        _save_speech_rates()
+
+
+def parse_target_duration(target_duration: str) -> tuple[int, int]:
+    """Parses a target such as "5-8 minutes" into (min_seconds, max_seconds)."""
+    match = _DURATION_RANGE_RE.search(target_duration)
+    if match is None:
+        raise ValueError(f"Invalid target duration: {target_duration!r}")
+    min_minutes = int(match.group(1))
+    max_minutes = int(match.group(2) or min_minutes)
+    return min_minutes * 60, max_minutes * 60
+
+
+def get_target_word_count(target_duration: str, model: str | None = None, voice: str | None = None) -> int:
+    """Returns the word count that fills the middle of a target duration."""
+    min_seconds, max_seconds = parse_target_duration(target_duration)
+    seconds_per_word = 60.0 / get_speech_rate(model, voice) + _AVERAGE_PAUSE_SECONDS_PER_WORD
+    return round((min_seconds + max_seconds) / 2 / seconds_per_word)
+
+
+def _distance_from_range(seconds, min_seconds, max_seconds):
+    return max(min_seconds - seconds, seconds - max_seconds, 0)
+
+
+def get_length_adjustment_prompt(transcript: str, estimated_seconds: float, target_duration: str, target_words: int) -> str:
+    """Builds the prompt for a single expand/trim pass over a transcript."""
+    action = "Expand" if estimated_seconds < parse_target_duration(target_duration)[0] else "Shorten"
+    return f"""
+You are editing a podcast script. When read aloud it would last about {format_duration(estimated_seconds)}, but the target duration is {target_duration}.
+
+{action} the script to approximately {target_words} words while keeping its structure, voice and key points.
+- When expanding, add depth, examples or smoother transitions; do not add filler.
+- When shortening, tighten wording and drop the least important details first.
+- Keep all tone and voice instructions enclosed in [ and ] tags.
+- Return only the revised script in plain text, with no commentary.
+
+Script:
+
+{transcript}"""
+
+
+def fit_transcript_to_duration(transcript: str, target_duration: str, generate, model: str | None = None, voice: str | None = None) -> dict:
+    """Checks a transcript against the target duration and fixes it at most once.
+
+    When the estimated spoken duration falls outside target_duration, a single
+    expand/trim pass is run through generate, so that a mis-sized script is
+    caught before any audio is rendered. The revision is only kept if it is
+    closer to the target, and if the pass fails the original is returned with
+    a warning rather than losing the transcript.
+
+    Args:
+        transcript: The generated transcript.
+        target_duration: The requested duration, e.g. "5-8 minutes".
+        generate: Callable taking a prompt and returning the LLM's text.
+        model: The TTS model the transcript will be read with.
+        voice: The TTS voice the transcript will be read with.
+
+    Returns:
+        A dictionary with "transcript", "estimated_seconds", "original_seconds",
+        "adjusted" (whether a revision was kept) and "warning" (a message when
+        the revision pass failed or was discarded, otherwise None).
+    """
+    min_seconds, max_seconds = parse_target_duration(target_duration)
+    normalized = normalize_transcript(transcript)
+    estimated = estimate_speech_duration(normalized["text"], model, voice)
+    result = {
+        "transcript": transcript,
+        "estimated_seconds": estimated,
+        "original_seconds": estimated,
+        "adjusted": False,
+        "warning": None,
+    }
+    if not normalized["word_count"] or min_seconds <= estimated <= max_seconds:
+        return result
+
+    # Aim for the middle of the range; scaling the word count keeps the
+    # punctuation pauses proportional to the text
+    target_seconds = (min_seconds + max_seconds) / 2
+    target_words = round(normalized["word_count"] * target_seconds / estimated)
+    try:
+        revised = generate(get_length_adjustment_prompt(
+            transcript, estimated, target_duration, target_words)).strip()
+    except Exception as e:
+        result["warning"] = f"Could not resize the transcript to fit {target_duration}: {e}"
+        return result
+
+    if not revised:
+        return result
+    revised_estimate = estimate_speech_duration(
+        normalize_transcript(revised)["text"], model, voice)
+    if (_distance_from_range(revised_estimate, min_seconds, max_seconds)
+            >= _distance_from_range(estimated, min_seconds, max_seconds)):
+        result["warning"] = (
+            f"Discarded a resized transcript of {format_duration(revised_estimate)} "
+            f"that was further from {target_duration} than the original.")
+        return result
+
+    result["transcript"] = revised
+    result["estimated_seconds"] = revised_estimate
+    result["adjusted"] = True
+    return result
+
+
+def prepare_for_tts(transcript: str, style_hints: bool = True, model: str | None = None, voice: str | None = None) -> dict:
+    """Runs the full normalization stage between the transcript editor and TTS.
+
+    Args:
+        transcript: The transcript as edited by the user.
+        style_hints: Whether tone tags are kept as per-paragraph hints.
+        model: The TTS model, used to pick the calibrated speech rate.
+        voice: The TTS voice, used to pick the calibrated speech rate.
+
+    Returns:
+        The normalize_transcript dictionary extended with "tts_text" and
+        "estimated_seconds".
+    """
+    normalized = normalize_transcript(transcript)
+    normalized["tts_text"] = render_tts_text(
+        normalized["segments"], style_hints)
+    normalized["estimated_seconds"] = estimate_speech_duration(
+        normalized["text"], model, voice)
+    return normalized
+
+
+def format_duration(seconds: float) -> str:
+    """Formats a duration in seconds as m:ss."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+if __name__ == "__main__":
+    # Benchmark the normalization stage on a large synthetic transcript.
+    paragraph = (
+        "[enthusiastic] ## Welcome back!  Today we're   exploring **black holes**,\n"
+        "the *strangest* objects in the universe. [pause] Ever wondered what\n"
+        "happens at the `event horizon`? Let's find out. [curious, slower]\n"
+        "- First, gravity.\n- Second, [emphasize] time itself bends.\n\n"
+    )
+    transcript = paragraph * 2000
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = prepare_for_tts(transcript)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"Input: {len(transcript):,} chars, {len(result['segments']):,} segments")
+    print(f"Output: {len(result['tts_text']):,} chars "
+          f"({100 * len(result['tts_text']) / len(transcript):.1f}% of input)")
+    print(f"Estimated duration: {format_duration(result['estimated_seconds'])}")
+    print(f"Normalization: {elapsed * 1000:.1f} ms/run, "
+          f"{len(transcript) / elapsed / 1e6:.1f} MB/s")